@@ -2,12 +2,14 @@ import importlib
 import os
 import sys
 from pathlib import Path
-from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter, ArgumentTypeError
 
 from jupyterlab.labapp import LabApp
 from jupytext.cli import jupytext
 from nbformat.sign import TrustNotebookApp
 
+from utils.benchmark import benchmark_notebooks
+
 demos = ["image-montage", "slurm-cluster"]
 
 
@@ -15,6 +17,13 @@ def executable(name: str) -> str:
     return os.path.join(os.path.dirname(sys.executable), name)
 
 
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise ArgumentTypeError(f"{value} is not a positive integer")
+    return number
+
+
 def call_jupyter(arguments):
     notebooks_path = Path("src", "notebooks")
     notebooks_path.mkdir(exist_ok=True)
@@ -27,6 +36,14 @@ def call_jupyter(arguments):
         TrustNotebookApp.clear_instance()
 
     set_environment(arguments)
+    if arguments.headless:
+        notebooks = [notebooks_path / f"{d}.ipynb" for d in demos]
+        baseline = Path(arguments.baseline) if arguments.baseline else None
+        if not benchmark_notebooks(notebooks, Path(arguments.results), arguments.kernels, arguments.cell_timeout,
+                                   baseline, arguments.regression_threshold, arguments.regression_minimum):
+            sys.exit(1)
+        return
+
     os.chdir(notebooks_path)
     LabApp.launch_instance(["--port=8888", "--no-browser", "--ip=0.0.0.0", "--ServerApp.token=''",
                             "--ServerApp.password=''", "--allow-root"])
@@ -49,6 +66,10 @@ def set_environment(arguments):
     if arguments.template_id:
         os.environ["TEMPLATE_ID"] = arguments.template_id
     os.environ["AUTO_SHUTDOWN"] = str(arguments.disable_auto_shutdown)
+    os.environ["LOCAL_PLATFORM"] = str(arguments.local_platform)
+    os.environ["BATCH_JOBS"] = str(getattr(arguments, "batch_jobs", False))
+    if getattr(arguments, "target_makespan", None):
+        os.environ["TARGET_MAKESPAN"] = str(arguments.target_makespan)
     os.environ["PYTHONPATH"] = ".."
 
 
@@ -74,6 +95,38 @@ def add_common_arguments(argument_parser: ArgumentParser):
              "shutdown. It can be useful to disable this if you wish to inspect the compute instances for a longer"
              "period."
     )
+    argument_parser.add_argument(
+        "--local-platform",
+        action='store_true',
+        help="Whether to run against an in-process stand-in for the platform instead of the platform URL. No compute"
+             " is provisioned and tasks complete as soon as they are waited upon"
+    )
+
+
+def add_slurm_cluster_arguments(argument_parser: ArgumentParser):
+    argument_parser.add_argument(
+        "--batch-jobs",
+        action='store_true',
+        help="Whether to submit all slurm-cluster jobs together from a single task, as one srun with a Slurm task per"
+             " job, rather than as one task per job. The output of each job is downloaded and split into separate"
+             " files."
+    )
+
+
+def add_image_montage_arguments(argument_parser: ArgumentParser):
+    argument_parser.add_argument(
+        "--target-makespan",
+        type=float,
+        default=300,
+        help="The target time, in seconds, for the image-montage tasks to run in. The worker pool is sized to meet"
+             " this, using the task durations recorded from earlier runs"
+    )
+
+
+demo_arguments = {
+    "image-montage": add_image_montage_arguments,
+    "slurm-cluster": add_slurm_cluster_arguments
+}
 
 
 parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
@@ -84,10 +137,34 @@ subparsers.required = True
 jupyter_parser = subparsers.add_parser("jupyter")
 jupyter_parser.set_defaults(func=call_jupyter)
 add_common_arguments(jupyter_parser)
+jupyter_parser.add_argument(
+    "--headless",
+    action='store_true',
+    help="Whether to execute the notebooks unattended, in parallel, instead of launching JupyterLab. The execution"
+         " time of each cell is written to the results file and the exit code is non-zero if any notebook fails"
+)
+jupyter_parser.add_argument("--kernels", type=positive_int, default=len(demos),
+                            help="The maximum number of kernels to execute notebooks with at once, when headless")
+jupyter_parser.add_argument("--cell-timeout", type=positive_int, default=3600,
+                            help="The time in seconds any cell may execute for before failing, when headless")
+jupyter_parser.add_argument("--results", default="benchmark_results.json",
+                            help="The file to write cell execution times to, when headless")
+jupyter_parser.add_argument("--baseline",
+                            help="A results file from an earlier headless run to compare cell execution times against."
+                                 " Any cell that regressed is reported and the exit code is non-zero")
+jupyter_parser.add_argument("--regression-threshold", type=float, default=1.5,
+                            help="How many times its baseline execution time a cell must take to have regressed")
+jupyter_parser.add_argument("--regression-minimum", type=float, default=0.1,
+                            help="How many seconds longer than its baseline execution time a cell must take to have"
+                                 " regressed, so that very fast cells do not regress on noise alone")
+for add_demo_arguments in demo_arguments.values():
+    add_demo_arguments(jupyter_parser)
 
 for demo in demos:
     subparser = subparsers.add_parser(demo)
     add_common_arguments(subparser)
+    if demo in demo_arguments:
+        demo_arguments[demo](subparser)
     subparser.set_defaults(func=call_python)
 
 args = parser.parse_args()
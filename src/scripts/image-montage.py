@@ -20,20 +20,21 @@
 # # Configuration
 
 # %%
+import json
 import os
+import time
 import urllib.parse
 from datetime import timedelta
 from pathlib import Path
-from typing import List
+from typing import Dict, List
 
 from utils.common import generate_unique_name, markdown, link, link_entity, use_template, image, script_relative_path, \
-    get_image_family_id
-from yellowdog_client import PlatformClient
+    get_image_family_id, create_platform_client
 from yellowdog_client.common.server_sent_events import DelegatedSubscriptionEventListener
-from yellowdog_client.model import ServicesSchema, ApiKey, ComputeRequirementDynamicTemplate, \
+from yellowdog_client.model import ComputeRequirementDynamicTemplate, \
     StringAttributeConstraint, WorkRequirement, TaskGroup, RunSpecification, Task, TaskInput, TaskOutput, FlattenPath, \
     ComputeRequirementTemplateUsage, ProvisionedWorkerPoolProperties, WorkRequirementStatus, TaskStatus, \
-    TaskInputVerification, AutoShutdown
+    TaskInputVerification, AutoShutdown, TaskSearch
 from yellowdog_client.object_store.model import FileTransferStatus
 
 key = os.environ['KEY']
@@ -42,13 +43,16 @@ url = os.environ['URL']
 namespace = os.environ['NAMESPACE']
 template_id = os.environ.get('TEMPLATE_ID')
 auto_shutdown = os.environ['AUTO_SHUTDOWN'] == "True"
+target_makespan = float(os.environ.get('TARGET_MAKESPAN', "300"))
+local_platform = os.environ.get('LOCAL_PLATFORM') == "True"
+
+max_instance_count = 8
+default_task_duration = 60.0
+node_provisioning_delay = 120.0
 
 run_id = generate_unique_name(namespace)
 
-client = PlatformClient.create(
-    ServicesSchema(defaultUrl=url),
-    ApiKey(key, secret)
-)
+client = create_platform_client(url, key, secret)
 
 image_family_id = get_image_family_id(client, "yd-agent-docker")
 
@@ -64,6 +68,65 @@ default_template = ComputeRequirementDynamicTemplate(
 
 markdown("Configured to run against", link(url))
 
+# %% [markdown]
+# # Plan Worker Pool size
+#
+# The size of the worker pool is planned from the TASKS that will be generated, the durations recorded for each of
+# them in earlier runs, and the target makespan. The conversion TASKS are independent of each other, whereas the
+# montage TASK waits for all of their outputs, holding a worker while it does so. Durations recorded against the local
+# platform stand-in are kept in a separate file, so that they are never used to plan a real Worker Pool.
+
+# %%
+
+conversions = {
+    "negate": ["-negate"],
+    "paint": ["-paint", "10"],
+    "charcoal": ["-charcoal", "2"],
+    "pixelate": ["-scale", "2%%", "-scale", "600x400"],
+    "vignette": ["-background", "black", "-vignette", "0x1"],
+    "blur": ["-morphology", "Convolve", "Blur:0x25"],
+    "mask": ["-fuzz", "15%%", "-transparent", "white", "-alpha", "extract", "-negate"],
+}
+
+montage_task_name = "montage-image"
+
+output_path = Path("out").resolve()
+output_path.mkdir(parents=True, exist_ok=True)
+task_durations_path = output_path / ("image-montage-durations.local.json" if local_platform
+                                     else "image-montage-durations.json")
+
+
+def load_task_durations() -> Dict[str, float]:
+    if not task_durations_path.exists():
+        return {}
+    return json.loads(task_durations_path.read_text())
+
+
+def estimate_makespan(durations: List[float], worker_count: int) -> float:
+    worker_finish_times = [0.0] * worker_count
+    for duration in sorted(durations, reverse=True):
+        worker_finish_times[worker_finish_times.index(min(worker_finish_times))] += duration
+    return max(worker_finish_times)
+
+
+def plan_worker_count(durations: List[float], time_budget: float) -> int:
+    for worker_count in range(1, len(durations)):
+        if estimate_makespan(durations, worker_count) <= time_budget:
+            return worker_count
+    return len(durations)
+
+
+task_durations = load_task_durations()
+conversion_durations = [task_durations.get(k + "-image", default_task_duration) for k in conversions]
+montage_duration = task_durations.get(montage_task_name, default_task_duration)
+
+conversion_worker_count = plan_worker_count(conversion_durations, target_makespan - montage_duration)
+worker_count = min(conversion_worker_count + 1, max_instance_count)
+estimated_makespan = montage_duration + estimate_makespan(conversion_durations, max(worker_count - 1, 1))
+
+markdown(f"Planned {worker_count} workers for {len(conversions) + 1} TASKS with an estimated makespan of "
+         f"{estimated_makespan:.0f}s (target {target_makespan:.0f}s)")
+
 # %% [markdown]
 # # Provision Worker Pool
 
@@ -75,7 +138,7 @@ with use_template(client, template_id, default_template) as template_id:
             templateId=template_id,
             requirementNamespace=namespace,
             requirementName=run_id,
-            targetInstanceCount=2
+            targetInstanceCount=worker_count
         ),
         ProvisionedWorkerPoolProperties(
             workerTag=run_id,
@@ -104,7 +167,7 @@ work_requirement = WorkRequirement(
             runSpecification=RunSpecification(
                 taskTypes=["docker"],
                 maximumTaskRetries=3,
-                maxWorkers=2,
+                maxWorkers=worker_count,
                 workerTags=[run_id]
             )
         )
@@ -142,16 +205,6 @@ def generate_task(task_name: str, conversion: List[str], output_file: str) -> Ta
 
 montage_picture_file = "montage_" + source_picture_file
 
-conversions = {
-    "negate": ["-negate"],
-    "paint": ["-paint", "10"],
-    "charcoal": ["-charcoal", "2"],
-    "pixelate": ["-scale", "2%%", "-scale", "600x400"],
-    "vignette": ["-background", "black", "-vignette", "0x1"],
-    "blur": ["-morphology", "Convolve", "Blur:0x25"],
-    "mask": ["-fuzz", "15%%", "-transparent", "white", "-alpha", "extract", "-negate"],
-}
-
 client.work_client.add_tasks_to_task_group_by_name(
     namespace,
     work_requirement.name,
@@ -159,7 +212,6 @@ client.work_client.add_tasks_to_task_group_by_name(
     [generate_task(k + "-image", v, k + "_" + source_picture_file) for k, v in conversions.items()]
 )
 
-montage_task_name = "montage-image"
 image_montage_tasks = [
     Task(
         name=montage_task_name,
@@ -213,9 +265,66 @@ markdown(link(
 
 # %% [markdown]
 # # Wait for the Work Requirement to finish
+#
+# Each time a TASK finishes, the durations measured so far are compared with those the Worker Pool was planned from.
+# If the remaining conversion TASKS would no longer finish within the target makespan, allowing for the time new nodes
+# take to be provisioned, the Worker Pool is scaled out. It is not scaled out if the remaining conversion TASKS would
+# finish before any new nodes could start on them.
+# Scaling in is left to the Worker Pool's idle node shutdown, which releases each node as soon as it has no TASK to run,
+# so that nodes still running TASKS, including the montage TASK waiting on its inputs, are never terminated.
 
 # %%
 
+conversion_task_durations = {k + "-image": d for k, d in zip(conversions, conversion_durations)}
+wait_started = time.monotonic()
+
+
+def measured_slowdown(tasks: List[Task]) -> float:
+    planned = 0.0
+    measured = 0.0
+    for task in tasks:
+        if task.status == TaskStatus.COMPLETED and task.startedTime and task.finishedTime:
+            planned += conversion_task_durations[task.name]
+            measured += (task.finishedTime - task.startedTime).total_seconds()
+    return max(measured / planned, 1.0) if planned else 1.0
+
+
+def scale_out():
+    global worker_count
+
+    tasks = [
+        task for task in client.work_client.find_tasks(TaskSearch(workRequirementId=work_requirement.id))
+        if task.name in conversion_task_durations
+    ]
+    slowdown = measured_slowdown(tasks)
+    remaining_durations = [
+        conversion_task_durations[task.name] * slowdown for task in tasks if task.status != TaskStatus.COMPLETED
+    ]
+    if not remaining_durations:
+        return
+
+    time_budget = target_makespan - (time.monotonic() - wait_started) - montage_duration * slowdown \
+        - node_provisioning_delay
+    required_worker_count = min(plan_worker_count(remaining_durations, time_budget) + 1, max_instance_count)
+    current_worker_count = client.worker_pool_client.get_worker_pool(worker_pool).expectedNodeCount
+    if required_worker_count <= current_worker_count:
+        return
+    if estimate_makespan(remaining_durations, max(current_worker_count - 1, 1)) <= node_provisioning_delay:
+        return
+
+    try:
+        if required_worker_count > worker_count:
+            latest_work_requirement = client.work_client.get_work_requirement(work_requirement)
+            latest_work_requirement.taskGroups[0].runSpecification.maxWorkers = required_worker_count
+            client.work_client.update_work_requirement(latest_work_requirement)
+        client.worker_pool_client.resize_worker_pool(worker_pool, required_worker_count)
+    except Exception as ex:
+        markdown(f"Failed to scale WORKER POOL out to {required_worker_count} nodes: {ex}")
+        return
+
+    worker_count = max(worker_count, required_worker_count)
+    markdown(f"Scaled WORKER POOL out to {required_worker_count} nodes")
+
 
 def on_update(work_req: WorkRequirement):
     completed = 0
@@ -225,6 +334,8 @@ def on_update(work_req: WorkRequirement):
         total += task_group.taskSummary.taskCount
 
     markdown(f"WORK REQUIREMENT is {work_req.status} with {completed}/{total} COMPLETED TASKS")
+    if not work_req.status.finished:
+        scale_out()
 
 
 markdown("Waiting for WORK REQUIREMENT to complete...")
@@ -238,12 +349,42 @@ if work_requirement.status != WorkRequirementStatus.COMPLETED:
     raise Exception("WORK REQUIREMENT did not complete. Status " + str(work_requirement.status))
 
 # %% [markdown]
-# # Download result of Work Requirement
+# # Record Task durations
+#
+# The duration of each TASK is blended into those recorded from earlier runs, to plan the size of the next Worker Pool.
+# The montage TASK is only timed from when the last of its inputs was produced, as it spends the time before that
+# waiting on the conversion TASKS.
 
 # %%
 
-output_path = Path("out").resolve()
-output_path.mkdir(parents=True, exist_ok=True)
+
+def save_task_durations(durations: Dict[str, float]):
+    task_durations_path.write_text(json.dumps(durations, indent=2, sort_keys=True))
+
+
+def task_duration(task: Task, tasks: List[Task]) -> float:
+    started = task.startedTime
+    if task.name == montage_task_name:
+        started = max([started, *[t.finishedTime for t in tasks if t.name in conversion_task_durations]])
+    return max((task.finishedTime - started).total_seconds(), 0.0)
+
+
+finished_tasks = [
+    task for task in client.work_client.find_tasks(TaskSearch(workRequirementId=work_requirement.id))
+    if task.status == TaskStatus.COMPLETED and task.startedTime and task.finishedTime
+]
+for task in finished_tasks:
+    duration = task_duration(task, finished_tasks)
+    previous_duration = task_durations.get(task.name)
+    task_durations[task.name] = duration if previous_duration is None else (previous_duration + duration) / 2
+
+save_task_durations(task_durations)
+markdown(f"Recorded TASK durations to: {task_durations_path}")
+
+# %% [markdown]
+# # Download result of Work Requirement
+
+# %%
 
 markdown("Waiting for output picture to download from Object Store...")
 output_object = f"{work_requirement.name}/{task_group_name}/{montage_task_name}/{montage_picture_file}"
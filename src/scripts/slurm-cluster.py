@@ -21,17 +21,20 @@
 
 # %%
 import os
+import re
 from datetime import timedelta
+from pathlib import Path
+from typing import Dict, List, Tuple
 
 from utils.common import generate_unique_name, markdown, link, link_entity, use_template, script_relative_path, \
-    get_image_family_id
-from yellowdog_client import PlatformClient
+    get_image_family_id, create_platform_client
 from yellowdog_client.common.server_sent_events import DelegatedSubscriptionEventListener
 from yellowdog_client.model import ProvisionedWorkerPoolProperties, NodeWorkerTarget, WorkerPoolNodeConfiguration, \
     NodeType, NodeSlotNumbering, NodeRunCommandAction, NodeIdFilter, NodeEvent, \
     NodeActionGroup, NodeWriteFileAction, NodeCreateWorkersAction, ComputeRequirementTemplateUsage, \
-    ServicesSchema, ApiKey, ComputeRequirementDynamicTemplate, StringAttributeConstraint, WorkRequirement, TaskGroup, \
+    ComputeRequirementDynamicTemplate, StringAttributeConstraint, WorkRequirement, TaskGroup, \
     Task, TaskOutput, RunSpecification, TaskStatus, WorkRequirementStatus, AutoShutdown
+from yellowdog_client.object_store.model import FileTransferStatus
 
 key = os.environ['KEY']
 secret = os.environ['SECRET']
@@ -39,13 +42,14 @@ url = os.environ['URL']
 namespace = os.environ['NAMESPACE']
 template_id = os.environ.get('TEMPLATE_ID')
 auto_shutdown = os.environ['AUTO_SHUTDOWN'] == "True"
+batch_jobs = os.environ.get('BATCH_JOBS') == "True"
 
 slurmd_nodes = 5
 tasks_per_slurmd_node = 5
 
 run_id = generate_unique_name(namespace)
 
-client = PlatformClient.create(ServicesSchema(defaultUrl=url), ApiKey(key, secret))
+client = create_platform_client(url, key, secret)
 
 image_family_id = get_image_family_id(client, "yd-agent-slurm")
 
@@ -155,23 +159,30 @@ markdown("Added", link_entity(url, worker_pool))
 
 # %% [markdown]
 # # Add Work Requirement
+#
+# By default, each Slurm job is submitted as its own TASK, running one `srun` on an exclusive worker. When batching is
+# enabled, all jobs are instead submitted together by a single TASK, which runs a batch script on one slurmd node. The
+# script submits the same `srun` for each job, keeping at most `max_concurrent_jobs` of them in flight, so that
+# submission and scheduling overhead stays flat however many jobs there are. As retrying the batch TASK would rerun
+# every job, failures are instead reported per job once the batch has finished.
 
 # %%
 
 task_type = "srun"
-total_tasks = tasks_per_slurmd_node * slurmd_nodes
+task_group_name = "tasks"
+total_jobs = tasks_per_slurmd_node * slurmd_nodes
 
 work_requirement = client.work_client.add_work_requirement(WorkRequirement(
     namespace=namespace,
     name=generate_unique_name(namespace),
     taskGroups=[TaskGroup(
-        name="tasks",
+        name=task_group_name,
         runSpecification=RunSpecification(
             taskTypes=[task_type],
             minWorkers=1,
             maxWorkers=1,
             exclusiveWorkers=True,
-            maximumTaskRetries=3,
+            maximumTaskRetries=0 if batch_jobs else 3,
             workerTags=[run_id]
         )
     )]
@@ -195,11 +206,55 @@ def generate_task() -> Task:
     )
 
 
-tasks = [generate_task() for _ in range(total_tasks)]
+max_concurrent_jobs = 10
+job_exit_status_prefix = "Job exit status: "
+
+# The batch script runs inside the batch TASK's own single node job step, so it clears the SLURM_* environment for each
+# job to be submitted as a separate Slurm job across all the slurmd nodes. Slurm queues any jobs that do not yet fit on
+# the nodes, and the script waits for one of its in-flight jobs to finish before submitting another, so only
+# max_concurrent_jobs srun processes are ever running on the batch node. Every line of a job's output is prefixed with
+# its job ID, and each job finishes by reporting its exit status, so the output can be split per job afterwards.
+batch_script = """
+unset $(compgen -e | grep '^SLURM_')
+failures=$(mktemp -d)
+for job in $(seq 0 $((JOB_COUNT - 1))); do
+    while [ "$(jobs -rp | wc -l)" -ge "$MAX_CONCURRENT_JOBS" ]; do wait -n; done
+    (
+        srun -N "$JOB_NODES" bash -c "$JOB_COMMAND" 2>&1 | sed -u "s/^/$job| /"
+        status=${PIPESTATUS[0]}
+        echo "$job| $JOB_EXIT_STATUS_PREFIX$status"
+        [ "$status" -eq 0 ] || touch "$failures/$job"
+    ) &
+done
+wait
+[ -z "$(ls -A "$failures")" ]
+"""
+
+
+def generate_batch_task() -> Task:
+    return Task(
+        name="batch",
+        taskType=task_type,
+        arguments=["-N", "1", "--ntasks", "1", "bash", "-c", batch_script],
+        environment={
+            "JOB_COUNT": str(total_jobs),
+            "JOB_NODES": str(slurmd_nodes),
+            "JOB_COMMAND": "echo Hello, world from $(hostname)!",
+            "JOB_EXIT_STATUS_PREFIX": job_exit_status_prefix,
+            "MAX_CONCURRENT_JOBS": str(max_concurrent_jobs)
+        },
+        outputs=[TaskOutput.from_task_process()]
+    )
+
+
+if batch_jobs:
+    tasks = [generate_batch_task()]
+else:
+    tasks = [generate_task() for _ in range(total_jobs)]
 
 client.work_client.add_tasks_to_task_group(work_requirement.taskGroups[0], tasks)
 
-markdown("Added TASKS to", link_entity(url, work_requirement))
+markdown(f"Added {len(tasks)} TASKS for {total_jobs} jobs to", link_entity(url, work_requirement))
 
 
 # %% [markdown]
@@ -224,10 +279,10 @@ client.work_client.add_work_requirement_listener(work_requirement, listener)
 work_requirement = client.work_client.get_work_requirement_helper(work_requirement) \
     .when_requirement_matches(lambda wr: wr.status.finished) \
     .result()
+client.work_client.remove_work_requirement_listener(listener)
 
-client.close()
-
-if work_requirement.status != WorkRequirementStatus.COMPLETED:
+if work_requirement.status != WorkRequirementStatus.COMPLETED and not batch_jobs:
+    client.close()
     raise Exception("WORK REQUIREMENT did not complete. Status: " + str(work_requirement.status))
 
 markdown(link(
@@ -235,3 +290,72 @@ markdown(link(
     f"#/objects/{namespace}/{work_requirement.name}%2F{work_requirement.taskGroups[0].name}%2F",
     "Output is available in Object Store"
 ))
+
+# %% [markdown]
+# # Split batched output into per-job outputs
+#
+# The batch script prefixes every line of output with the ID of the job that produced it, which is used to map the
+# output of the batch TASK back to the individual jobs. This is done whether or not the batch TASK completed, so that
+# the jobs that failed can be identified from the exit status each job reports.
+
+# %%
+
+
+def split_job_outputs(process_output: str) -> Tuple[Dict[int, List[str]], Dict[int, int]]:
+    job_outputs = {job: [] for job in range(total_jobs)}
+    job_exit_statuses = {}
+    for line in process_output.splitlines():
+        match = re.match(r"^(\d+)\| (.*)$", line)
+        if not match or int(match.group(1)) not in job_outputs:
+            continue
+        job, text = int(match.group(1)), match.group(2)
+        if text.startswith(job_exit_status_prefix):
+            job_exit_statuses[job] = int(text[len(job_exit_status_prefix):])
+        else:
+            job_outputs[job].append(text)
+    return job_outputs, job_exit_statuses
+
+
+if batch_jobs:
+    output_path = Path("out").resolve()
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    process_output_file = "taskoutput.txt"
+    batch_output_file = f"{run_id}_{process_output_file}"
+
+    markdown("Waiting for batch output to download from Object Store...")
+    client.object_store_client.start_transfers()
+    output_object = f"{work_requirement.name}/{task_group_name}/{tasks[0].name}/{process_output_file}"
+    session = client.object_store_client \
+        .create_download_session(namespace, output_object, str(output_path), batch_output_file)
+    session.bind(on_error=lambda error_args: markdown(
+        f"Error downloading file: {error_args.error_type} - {error_args.message}. {''.join(error_args.detail)}"))
+    session.start()
+    session = session.when_status_matches(lambda status: status.is_finished()).result()
+
+    if session.status != FileTransferStatus.Completed:
+        client.close()
+        raise Exception(f"Batch output failed to download. Status: {session.status}. WORK REQUIREMENT status: "
+                        f"{work_requirement.status}")
+
+    job_outputs, job_exit_statuses = split_job_outputs((output_path / batch_output_file).read_text())
+    failed_jobs = [job for job in job_outputs if job_exit_statuses.get(job) != 0]
+
+    job_output_path = output_path / run_id
+    job_output_path.mkdir(exist_ok=True)
+    for job, lines in job_outputs.items():
+        (job_output_path / f"job-{job}.txt").write_text("\n".join(lines) + "\n")
+
+    markdown(f"{total_jobs - len(failed_jobs)}/{total_jobs} jobs succeeded. Output for each job has been written to: "
+             f"{job_output_path}")
+    if failed_jobs:
+        markdown("Failed jobs:", ", ".join(
+            f"job {job} (exit status {job_exit_statuses[job]})" if job in job_exit_statuses
+            else f"job {job} (no exit status)"
+            for job in failed_jobs
+        ))
+
+client.close()
+
+if work_requirement.status != WorkRequirementStatus.COMPLETED:
+    raise Exception("WORK REQUIREMENT did not complete. Status: " + str(work_requirement.status))
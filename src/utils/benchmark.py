@@ -0,0 +1,115 @@
+import asyncio
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+import nbformat
+from nbclient import NotebookClient
+
+
+def parse_timestamp(value: str) -> datetime:
+    return datetime.fromisoformat(value[:-1] if value.endswith("Z") else value)
+
+
+def cell_duration(cell: nbformat.NotebookNode) -> Optional[float]:
+    execution = cell.get("metadata", {}).get("execution", {})
+    if "iopub.execute_input" not in execution or "shell.execute_reply" not in execution:
+        return None
+
+    started = parse_timestamp(execution["iopub.execute_input"])
+    finished = parse_timestamp(execution["shell.execute_reply"])
+    return (finished - started).total_seconds()
+
+
+async def execute_notebook(notebook_path: Path, kernels: asyncio.Semaphore, timeout: int) -> dict:
+    result = {"notebook": notebook_path.stem, "status": "COMPLETED"}
+    notebook = None
+    async with kernels:
+        try:
+            notebook = nbformat.read(str(notebook_path), as_version=4)
+            await NotebookClient(
+                notebook,
+                timeout=timeout,
+                kernel_name="python3",
+                resources={"metadata": {"path": str(notebook_path.parent)}}
+            ).async_execute()
+        except Exception as error:
+            result["status"] = "FAILED"
+            result["error"] = f"{type(error).__name__}: {error}"
+
+    result["cells"] = [
+        {
+            "index": index,
+            "source": next((line for line in cell.source.splitlines() if line.strip()), ""),
+            "duration": cell_duration(cell)
+        }
+        for index, cell in enumerate(notebook.cells if notebook else [])
+        if cell.cell_type == "code"
+    ]
+    result["duration"] = sum(cell["duration"] for cell in result["cells"] if cell["duration"] is not None)
+    return result
+
+
+async def execute_notebooks(notebook_paths: List[Path], kernel_count: int, timeout: int) -> List[dict]:
+    kernels = asyncio.Semaphore(kernel_count)
+    return await asyncio.gather(*[execute_notebook(path, kernels, timeout) for path in notebook_paths])
+
+
+def find_regressions(results: List[dict], baseline: dict, threshold: float, minimum_increase: float) -> List[dict]:
+    baseline_durations = {
+        (notebook["notebook"], cell["index"]): cell["duration"]
+        for notebook in baseline["notebooks"]
+        for cell in notebook["cells"]
+    }
+
+    regressions = []
+    for notebook in results:
+        for cell in notebook["cells"]:
+            baseline_duration = baseline_durations.get((notebook["notebook"], cell["index"]))
+            if cell["duration"] is None or baseline_duration is None:
+                continue
+            if cell["duration"] > baseline_duration * threshold and \
+                    cell["duration"] - baseline_duration > minimum_increase:
+                regressions.append({
+                    "notebook": notebook["notebook"],
+                    "index": cell["index"],
+                    "source": cell["source"],
+                    "baseline": baseline_duration,
+                    "duration": cell["duration"]
+                })
+    return regressions
+
+
+def benchmark_notebooks(
+        notebook_paths: List[Path],
+        results_path: Path,
+        kernel_count: int,
+        timeout: int,
+        baseline_path: Optional[Path] = None,
+        threshold: float = 1.5,
+        minimum_increase: float = 0.1
+) -> bool:
+    """
+    Executes the notebooks in parallel, using at most kernel_count kernels at once, and writes the execution time of
+    each of their code cells to results_path. Cells that did not execute have a duration of null. If a baseline results
+    file is given, any cell that took more than threshold times, and more than minimum_increase seconds longer than, its
+    baseline duration is reported as a regression. Returns whether all the notebooks executed successfully without
+    regressions.
+    """
+    results = asyncio.run(execute_notebooks(notebook_paths, kernel_count, timeout))
+    output = {"notebooks": results}
+    if baseline_path:
+        output["regressions"] = find_regressions(
+            results, json.loads(baseline_path.read_text()), threshold, minimum_increase
+        )
+    results_path.write_text(json.dumps(output, indent=2))
+
+    for result in results:
+        if result["status"] != "COMPLETED":
+            print(f"Notebook {result['notebook']} failed: {result['error']}")
+    for regression in output.get("regressions", []):
+        print(f"Cell {regression['index']} of {regression['notebook']} regressed from {regression['baseline']:.3f}s "
+              f"to {regression['duration']:.3f}s: {regression['source']}")
+
+    return all(result["status"] == "COMPLETED" for result in results) and not output.get("regressions")
@@ -1,4 +1,5 @@
 import contextlib
+import os
 import re
 import uuid
 from dataclasses import dataclass
@@ -10,13 +11,21 @@ from IPython import get_ipython
 from IPython.display import display, Markdown
 from yellowdog_client import PlatformClient
 from yellowdog_client.model import ComputeRequirementTemplate, WorkRequirement, ComputeRequirement, \
-    ConfiguredWorkerPool, ProvisionedWorkerPool, MachineImageFamilySearch
+    ConfiguredWorkerPool, ProvisionedWorkerPool, MachineImageFamilySearch, ServicesSchema, ApiKey
 
 
 def generate_unique_name(prefix: str) -> str:
     return (prefix + "-" + str(uuid.uuid4()))[:50]
 
 
+def create_platform_client(url: str, key: str, secret: str) -> PlatformClient:
+    if os.environ.get("LOCAL_PLATFORM") == "True":
+        from utils.local_platform import LocalPlatformClient
+        return LocalPlatformClient()
+
+    return PlatformClient.create(ServicesSchema(defaultUrl=url), ApiKey(key, secret))
+
+
 @contextlib.contextmanager
 def use_template(
         client: PlatformClient,
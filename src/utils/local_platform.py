@@ -0,0 +1,457 @@
+import inspect
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import uuid
+from concurrent.futures import Future
+from copy import deepcopy
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from yellowdog_client.common.server_sent_events import SubscriptionEventListener
+from yellowdog_client.compute import ComputeClient
+from yellowdog_client.images import ImagesClient
+from yellowdog_client.model import ComputeRequirementTemplate, ComputeRequirement, ComputeRequirementTemplateUsage, \
+    ProvisionedWorkerPoolProperties, ProvisionedWorkerPool, MachineImageFamilySearch, MachineImageFamilySummary, \
+    WorkRequirement, WorkRequirementStatus, TaskGroup, TaskGroupStatus, TaskSummary, Task, TaskStatus, TaskSearch, \
+    TaskInputSource, TaskOutputSource
+from yellowdog_client.object_store import ObjectStoreClient
+from yellowdog_client.object_store.model import FileTransferStatus, TransferStatistics
+from yellowdog_client.scheduler import WorkClient, WorkerPoolClient, WorkRequirementHelper
+
+process_output_file = "taskoutput.txt"
+
+
+def generate_id(entity_type: str) -> str:
+    return f"ydid:{entity_type}:local:{uuid.uuid4()}"
+
+
+class LocalImagesClient:
+    @dataclass
+    class Results:
+        items: List[MachineImageFamilySummary]
+
+        def iterate(self) -> List[MachineImageFamilySummary]:
+            return self.items
+
+    def get_image_families(self, search: MachineImageFamilySearch) -> Results:
+        return self.Results([MachineImageFamilySummary(
+            id=generate_id("imgfam"),
+            namespace=search.namespace,
+            name=search.familyName
+        )])
+
+
+class LocalComputeClient:
+    def __init__(self):
+        self.templates: Dict[str, ComputeRequirementTemplate] = {}
+        self.requirements: Dict[str, ComputeRequirement] = {}
+
+    def add_compute_requirement_template(
+            self,
+            compute_requirement_template: ComputeRequirementTemplate
+    ) -> ComputeRequirementTemplate:
+        compute_requirement_template.id = generate_id("crt")
+        self.templates[compute_requirement_template.id] = compute_requirement_template
+        return compute_requirement_template
+
+    def delete_compute_requirement_template(self, compute_requirement_template: ComputeRequirementTemplate) -> None:
+        self.templates.pop(compute_requirement_template.id, None)
+
+    def _provision_compute_requirement(self, usage: ComputeRequirementTemplateUsage) -> ComputeRequirement:
+        compute_requirement = ComputeRequirement(
+            namespace=usage.requirementNamespace,
+            name=usage.requirementName,
+            provisionStrategy=None,
+            targetInstanceCount=usage.targetInstanceCount,
+            expectedInstanceCount=usage.targetInstanceCount
+        )
+        compute_requirement.id = generate_id("compreq")
+        self.requirements[compute_requirement.id] = compute_requirement
+        return compute_requirement
+
+    def get_compute_requirement_by_id(self, compute_requirement_id: str) -> ComputeRequirement:
+        return self.requirements[compute_requirement_id]
+
+
+class LocalWorkerPoolClient:
+    def __init__(self, compute_client: LocalComputeClient):
+        self.compute_client = compute_client
+        self.worker_pools: Dict[str, ProvisionedWorkerPool] = {}
+
+    def provision_worker_pool(
+            self,
+            compute_requirement_template_usage: ComputeRequirementTemplateUsage,
+            provisioned_properties: Optional[ProvisionedWorkerPoolProperties] = None
+    ) -> ProvisionedWorkerPool:
+        compute_requirement = self.compute_client._provision_compute_requirement(compute_requirement_template_usage)
+        worker_pool = ProvisionedWorkerPool(
+            id=generate_id("wrkrpool"),
+            name=compute_requirement_template_usage.requirementName,
+            createdTime=datetime.now(timezone.utc),
+            expectedNodeCount=compute_requirement_template_usage.targetInstanceCount,
+            properties=provisioned_properties,
+            computeRequirementId=compute_requirement.id
+        )
+        self.worker_pools[worker_pool.id] = worker_pool
+        return worker_pool
+
+    def resize_worker_pool(self, worker_pool: ProvisionedWorkerPool, size: int) -> ProvisionedWorkerPool:
+        worker_pool = self.worker_pools[worker_pool.id]
+        worker_pool.expectedNodeCount = size
+        compute_requirement = self.compute_client.get_compute_requirement_by_id(worker_pool.computeRequirementId)
+        compute_requirement.targetInstanceCount = size
+        compute_requirement.expectedInstanceCount = size
+        return worker_pool
+
+    def get_worker_pool(self, worker_pool: ProvisionedWorkerPool) -> ProvisionedWorkerPool:
+        return self.worker_pools[worker_pool.id]
+
+
+class LocalObjectStore:
+    def __init__(self):
+        self.root = Path(tempfile.mkdtemp(prefix="local-platform-"))
+
+    def object_path(self, namespace: str, object_name: str) -> Path:
+        return self.root / namespace / object_name
+
+    def put(self, namespace: str, object_name: str, content: bytes) -> None:
+        path = self.object_path(namespace, object_name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+
+    def get(self, namespace: str, object_name: str) -> Optional[bytes]:
+        path = self.object_path(namespace, object_name)
+        return path.read_bytes() if path.is_file() else None
+
+    def close(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+class LocalWorkRequirementHelper:
+    def __init__(self, work_requirement: WorkRequirement, work_client: 'LocalWorkClient'):
+        self.work_requirement = work_requirement
+        self.work_client = work_client
+
+    def when_requirement_matches(self, predicate: Callable[[WorkRequirement], bool]) -> Future:
+        future = Future()
+        work_requirement = self.work_client._run_tasks(self.work_requirement.id)
+        if predicate(work_requirement):
+            future.set_result(work_requirement)
+        else:
+            future.set_exception(Exception(
+                "WORK REQUIREMENT finished without matching. Status: " + str(work_requirement.status)
+            ))
+        return future
+
+
+class LocalWorkClient:
+    """
+    Runs each TASK in the order it was added, as soon as the WORK REQUIREMENT is waited upon. A TASK fails if any of its
+    inputs are missing from the object store. Otherwise, it copies its first input to each of its worker directory
+    outputs. srun TASKS run locally through the srun stand-in in utils.local_srun, which is also on the PATH of the
+    commands they run. Other TASKS record their command line as their process output.
+    """
+
+    def __init__(self, object_store: LocalObjectStore):
+        self.object_store = object_store
+        self.srun_path = object_store.root / "bin" / "srun"
+        self.srun_path.parent.mkdir()
+        self.srun_path.write_text(
+            f'#!/bin/sh\nexec "{sys.executable}" "{Path(__file__).parent / "local_srun.py"}" "$@"\n'
+        )
+        self.srun_path.chmod(0o755)
+        self.work_requirements: Dict[str, WorkRequirement] = {}
+        self.tasks: Dict[str, List[Task]] = {}
+        self.listeners: Dict[str, List[SubscriptionEventListener]] = {}
+
+    def get_work_requirement(self, work_requirement: WorkRequirement) -> WorkRequirement:
+        return self.work_requirements[work_requirement.id]
+
+    def update_work_requirement(self, work_requirement: WorkRequirement) -> WorkRequirement:
+        self.work_requirements[work_requirement.id] = work_requirement
+        return work_requirement
+
+    def add_work_requirement(self, work_requirement: WorkRequirement) -> WorkRequirement:
+        work_requirement.id = generate_id("workreq")
+        work_requirement.createdTime = datetime.now(timezone.utc)
+        work_requirement.status = WorkRequirementStatus.RUNNING
+        for task_group in work_requirement.taskGroups:
+            task_group.id = generate_id("taskgrp")
+            task_group.status = TaskGroupStatus.PENDING
+            self.tasks[task_group.id] = []
+            self._update_task_summary(task_group)
+        self.work_requirements[work_requirement.id] = work_requirement
+        self.listeners[work_requirement.id] = []
+        return work_requirement
+
+    def add_tasks_to_task_group(self, task_group: TaskGroup, tasks: List[Task]) -> List[Task]:
+        for task in tasks:
+            task.id = generate_id("task")
+            task.taskGroupId = task_group.id
+            task.status = TaskStatus.READY
+            task.retryCount = 0
+        self.tasks[task_group.id].extend(tasks)
+        self._update_task_summary(self._find_task_group(task_group.id))
+        return tasks
+
+    def add_tasks_to_task_group_by_name(
+            self,
+            namespace: str,
+            work_requirement_name: str,
+            task_group_name: str,
+            tasks: List[Task]
+    ) -> List[Task]:
+        for work_requirement in self.work_requirements.values():
+            if work_requirement.namespace != namespace or work_requirement.name != work_requirement_name:
+                continue
+            for task_group in work_requirement.taskGroups:
+                if task_group.name == task_group_name:
+                    return self.add_tasks_to_task_group(task_group, tasks)
+        raise Exception(f"Unable to find TASK GROUP: {namespace}/{work_requirement_name}/{task_group_name}")
+
+    def find_tasks(self, search: TaskSearch) -> List[Task]:
+        tasks = []
+        for work_requirement in self.work_requirements.values():
+            if search.workRequirementId and work_requirement.id != search.workRequirementId:
+                continue
+            for task_group in work_requirement.taskGroups:
+                if search.taskGroupId and task_group.id != search.taskGroupId:
+                    continue
+                tasks.extend(task for task in self.tasks[task_group.id] if not search.name or task.name == search.name)
+        return tasks
+
+    def add_work_requirement_listener(
+            self,
+            work_requirement: WorkRequirement,
+            listener: SubscriptionEventListener
+    ) -> None:
+        self.listeners[work_requirement.id].append(listener)
+        self._notify_listener(listener, self.work_requirements[work_requirement.id])
+
+    def remove_work_requirement_listener(self, listener: SubscriptionEventListener) -> None:
+        for listeners in self.listeners.values():
+            if listener in listeners:
+                listeners.remove(listener)
+                listener.subscription_cancelled()
+
+    def get_work_requirement_helper(self, work_requirement: WorkRequirement) -> LocalWorkRequirementHelper:
+        return LocalWorkRequirementHelper(work_requirement, self)
+
+    def _find_task_group(self, task_group_id: str) -> TaskGroup:
+        for work_requirement in self.work_requirements.values():
+            for task_group in work_requirement.taskGroups:
+                if task_group.id == task_group_id:
+                    return task_group
+        raise Exception("Unable to find TASK GROUP: " + task_group_id)
+
+    def _update_task_summary(self, task_group: TaskGroup) -> None:
+        status_counts = {status: 0 for status in TaskStatus}
+        for task in self.tasks[task_group.id]:
+            status_counts[task.status] += 1
+        task_group.taskSummary = TaskSummary(
+            statusCounts=status_counts,
+            taskCount=len(self.tasks[task_group.id]),
+            lastUpdatedTime=datetime.now(timezone.utc)
+        )
+
+    def _notify_listeners(self, work_requirement: WorkRequirement) -> None:
+        for listener in list(self.listeners[work_requirement.id]):
+            self._notify_listener(listener, work_requirement)
+
+    @staticmethod
+    def _notify_listener(listener: SubscriptionEventListener, work_requirement: WorkRequirement) -> None:
+        # As in the SDK, each listener receives its own copy and any exception it raises is reported, then ignored
+        try:
+            listener.updated(deepcopy(work_requirement))
+        except Exception as ex:
+            print(str(ex))
+
+    def _run_tasks(self, work_requirement_id: str) -> WorkRequirement:
+        work_requirement = self.work_requirements[work_requirement_id]
+        if work_requirement.status.finished:
+            return work_requirement
+
+        failed = False
+        for task_group in work_requirement.taskGroups:
+            task_group.status = TaskGroupStatus.RUNNING
+            for task in self.tasks[task_group.id]:
+                if task.status.finished:
+                    continue
+                task.status = self._run_task(work_requirement, task_group, task)
+                self._update_task_summary(task_group)
+                self._notify_listeners(work_requirement)
+                failed = failed or task.status != TaskStatus.COMPLETED
+            task_group.status = TaskGroupStatus.FAILED if failed else TaskGroupStatus.COMPLETED
+
+        work_requirement.status = WorkRequirementStatus.FAILED if failed else WorkRequirementStatus.COMPLETED
+        work_requirement.statusChangedTime = datetime.now(timezone.utc)
+        self._notify_listeners(work_requirement)
+        return work_requirement
+
+    def _run_task(self, work_requirement: WorkRequirement, task_group: TaskGroup, task: Task) -> TaskStatus:
+        task.startedTime = datetime.now(timezone.utc)
+        try:
+            inputs = []
+            for task_input in task.inputs or []:
+                input_namespace = work_requirement.namespace
+                if task_input.source == TaskInputSource.OTHER_NAMESPACE:
+                    input_namespace = task_input.namespace
+                content = self.object_store.get(input_namespace, task_input.objectNamePattern)
+                if content is None:
+                    return TaskStatus.FAILED
+                inputs.append(content)
+
+            if task.taskType == "srun":
+                process = subprocess.run(
+                    [str(self.srun_path), *(task.arguments or [])],
+                    env={
+                        **os.environ,
+                        **(task.environment or {}),
+                        "PATH": str(self.srun_path.parent) + os.pathsep + os.environ.get("PATH", "")
+                    },
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    universal_newlines=True
+                )
+                process_output, exit_code = process.stdout, process.returncode
+            else:
+                process_output, exit_code = " ".join([task.taskType, *(task.arguments or [])]) + "\n", 0
+
+            output_prefix = f"{work_requirement.name}/{task_group.name}/{task.name}/"
+            for task_output in task.outputs or []:
+                if task_output.source == TaskOutputSource.PROCESS_OUTPUT:
+                    self.object_store.put(work_requirement.namespace, output_prefix + process_output_file,
+                                          process_output.encode())
+                elif task_output.source == TaskOutputSource.WORKER_DIRECTORY and exit_code == 0:
+                    self.object_store.put(work_requirement.namespace, output_prefix + task_output.filePattern,
+                                          inputs[0] if inputs else b"")
+            return TaskStatus.COMPLETED if exit_code == 0 else TaskStatus.FAILED
+        finally:
+            task.finishedTime = datetime.now(timezone.utc)
+
+
+class LocalTransferSession:
+    def __init__(self, transfer: Callable[[], Optional[int]]):
+        self.transfer = transfer
+        self.status = FileTransferStatus.Ready
+        self.bytes_transferred = 0
+
+    def bind(self, on_error: Optional[Callable] = None) -> None:
+        pass
+
+    def start(self) -> None:
+        bytes_transferred = self.transfer()
+        if bytes_transferred is None:
+            self.status = FileTransferStatus.Failed
+        else:
+            self.status = FileTransferStatus.Completed
+            self.bytes_transferred = bytes_transferred
+
+    def when_status_matches(self, status_predicate: Callable[[FileTransferStatus], bool]) -> Future:
+        future = Future()
+        future.set_result(self)
+        return future
+
+    def get_statistics(self) -> TransferStatistics:
+        return TransferStatistics(bytes_transferred=self.bytes_transferred, total_bytes=self.bytes_transferred)
+
+
+class LocalObjectStoreClient:
+    def __init__(self, object_store: LocalObjectStore):
+        self.object_store = object_store
+
+    def start_transfers(self) -> None:
+        pass
+
+    def create_upload_session(
+            self,
+            file_namespace: str,
+            source_file_path: str,
+            destination_file_name: Optional[str] = None
+    ) -> LocalTransferSession:
+        def upload() -> int:
+            content = Path(source_file_path).read_bytes()
+            self.object_store.put(file_namespace, destination_file_name or Path(source_file_path).name, content)
+            return len(content)
+
+        return LocalTransferSession(upload)
+
+    def create_download_session(
+            self,
+            file_namespace: str,
+            file_name: str,
+            destination_folder_path: str,
+            destination_file_name: Optional[str] = None
+    ) -> LocalTransferSession:
+        def download() -> Optional[int]:
+            content = self.object_store.get(file_namespace, file_name)
+            if content is None:
+                return None
+            (Path(destination_folder_path) / (destination_file_name or Path(file_name).name)).write_bytes(content)
+            return len(content)
+
+        return LocalTransferSession(download)
+
+
+class LocalPlatformClient:
+    """
+    An in-process stand-in for the PlatformClient, covering the parts of it that the demos use. It allows the demos to
+    be run without credentials or compute, for example to benchmark them.
+    """
+
+    def __init__(self):
+        self.object_store = LocalObjectStore()
+        self.images_client = LocalImagesClient()
+        self.compute_client = LocalComputeClient()
+        self.worker_pool_client = LocalWorkerPoolClient(self.compute_client)
+        self.work_client = LocalWorkClient(self.object_store)
+        self.object_store_client = LocalObjectStoreClient(self.object_store)
+
+    def close(self) -> None:
+        self.object_store.close()
+
+
+stand_ins = {
+    LocalImagesClient: ImagesClient,
+    LocalComputeClient: ComputeClient,
+    LocalWorkerPoolClient: WorkerPoolClient,
+    LocalWorkClient: WorkClient,
+    LocalWorkRequirementHelper: WorkRequirementHelper,
+    LocalObjectStoreClient: ObjectStoreClient
+}
+
+
+def verify_stand_ins() -> None:
+    """
+    Checks that every public method of the stand-in clients exists on the SDK client it stands in for, with the same
+    parameters in the same order, and that any SDK parameters it leaves out are optional. This ensures the demos cannot
+    come to depend on methods or arguments that the real platform client does not have.
+    """
+    for stand_in, sdk_class in stand_ins.items():
+        for name, method in inspect.getmembers(stand_in, inspect.isfunction):
+            if name.startswith("_"):
+                continue
+            if not hasattr(sdk_class, name):
+                raise TypeError(f"{stand_in.__name__}.{name} does not exist on {sdk_class.__name__}")
+
+            parameters = list(inspect.signature(method).parameters.values())
+            sdk_parameters = list(inspect.signature(getattr(sdk_class, name)).parameters.values())
+            mismatch = len(parameters) > len(sdk_parameters) or any(
+                parameter.name != sdk_parameter.name or parameter.kind != sdk_parameter.kind
+                or (parameter.default is inspect.Parameter.empty) != (sdk_parameter.default is inspect.Parameter.empty)
+                for parameter, sdk_parameter in zip(parameters, sdk_parameters)
+            ) or any(
+                sdk_parameter.default is inspect.Parameter.empty for sdk_parameter in sdk_parameters[len(parameters):]
+            )
+            if mismatch:
+                raise TypeError(f"{stand_in.__name__}.{name}{inspect.signature(method)} does not match "
+                                f"{sdk_class.__name__}.{name}{inspect.signature(getattr(sdk_class, name))}")
+
+
+if __name__ == "__main__":
+    verify_stand_ins()
@@ -0,0 +1,51 @@
+"""
+A stand-in for the srun command, used by the local platform stand-in. It runs the command locally once per Slurm task,
+with SLURM_PROCID set, and labels the output like `srun --label` when asked to. It exits with the first non-zero exit
+status of any Slurm task.
+"""
+import os
+import subprocess
+import sys
+from typing import List
+
+srun_flags = {"--label", "-l", "--overcommit", "-O"}
+
+
+def srun(arguments: List[str]) -> int:
+    nodes = 1
+    ntasks = None
+    label = False
+    index = 0
+    while index < len(arguments) and arguments[index].startswith("-"):
+        option, _, value = arguments[index].partition("=")
+        index += 1
+        if option in srun_flags:
+            label = label or option in ("--label", "-l")
+            continue
+        if not value:
+            value = arguments[index]
+            index += 1
+        if option in ("-N", "--nodes"):
+            nodes = int(value)
+        elif option in ("-n", "--ntasks"):
+            ntasks = int(value)
+
+    ntasks = ntasks or nodes
+    width = len(str(ntasks - 1))
+    exit_code = 0
+    for rank in range(ntasks):
+        process = subprocess.run(
+            arguments[index:],
+            env={**os.environ, "SLURM_PROCID": str(rank)},
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True
+        )
+        for line in process.stdout.splitlines():
+            print(f"{rank:>{width}}: {line}" if label else line, flush=True)
+        exit_code = exit_code or process.returncode
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(srun(sys.argv[1:]))